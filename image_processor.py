@@ -1,25 +1,334 @@
 import os
 import json
+import asyncio
+import tempfile
+import itertools
+import multiprocessing
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Keep Tesseract single-threaded; parallelism is handled by the worker pool
+# in process_folder, and OpenMP threads would oversubscribe it. Set before
+# Tesseract is loaded, since OpenMP reads it once at startup
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 import pytesseract
 import cv2
 import numpy as np
 import logging
+import logging.handlers
 import time
+from PIL import Image
 from text_processor import TextProcessor
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import ocr_cache
+from llm_json import parse_llm_json
+
+try:
+    from tesserocr import PyTessBaseAPI, PSM, OEM, RIL, iterate_level
+except ImportError:  # Fall back to the Tesseract command line via pytesseract
+    PyTessBaseAPI = None
 
-# Configure logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Initialize text processor
 text_processor = TextProcessor()
 
 # LLM Configuration
-MODEL_NAME = "fused_3b"
+# Point OCR_LLM_MODEL at a 4/5-bit quant (e.g. Q4_K_M) of the extraction
+# model to cut decode memory traffic
+MODEL_NAME = os.environ.get("OCR_LLM_MODEL", "fused_3b")
+
+# Schema-constrained JSON needs no sampling; cap decode length so a
+# runaway generation cannot stall a batch
+LLM_SAMPLING = {
+    "temperature": 0,
+    "top_p": 1,
+    "max_tokens": 1024
+}
+
+# Local LM Studio server
+LLM_BASE_URL = "http://localhost:1234/v1"
+LLM_API_KEY = "lm-studio"
+
+# Serving backend behind LLM_BASE_URL: 'lmstudio', 'vllm' or 'llama.cpp'
+LLM_BACKEND = os.environ.get("OCR_LLM_BACKEND", "lmstudio")
+
+# Receipts per batched completions request, and batched requests in flight
+# at once so the server can overlap prefill of one with decode of another
+LLM_BATCH_SIZE = 8
+LLM_CONCURRENCY = 8
+
+# OpenAI client shared so its connection pool and keep-alive connections
+# persist across requests
+_client = OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY)
+
+# Bump when the schema or prompts change to invalidate cached extractions
+SCHEMA_VERSION = "1"
+
+# Tesseract configuration shared by single-image and batch OCR
+TESSERACT_CONFIG = (
+    '--oem 1 '  # LSTM engine only, the legacy model is never loaded
+    '--psm 6 '  # Assume a single uniform block of text, as on receipts
+    '-l eng '   # English language
+    '-c preserve_interword_spaces=1 '  # Preserve word spacing
+    '-c tessedit_do_invert=0'  # Don't invert colors
+)
+
+# Longest image side, in pixels, handed to Tesseract
+MAX_OCR_SIDE = 2000
+
+# Kernel of the noise-removing opening applied after thresholding
+OPENING_KERNEL = np.ones((2, 2), np.uint8)
+
+# Image inputs accepted by the OCR functions: a file path, a PIL image or a
+# numpy array (grayscale or RGB, as produced by PIL and pdf2image)
+ImageSource = Union[str, Image.Image, np.ndarray]
+
+# Word boxes stored column-wise: "text" is a list of words, "bbox" an (N, 4)
+# int array of [x1, y1, x2, y2] rows and "confidence" a float array, with
+# further per-box columns such as "page" added by callers
+Boxes = Dict[str, Any]
+
+# Images decoded ahead of the one being recognized
+IMAGE_PREFETCH = 2
+
+# Bump when preprocessing changes to invalidate cached OCR results
+PREPROC_VERSION = "3"
+
+# Tesseract terminates every recognized page with a form feed
+PAGE_SEPARATOR = '\x0c'
+
+# Batch images handed to the Tesseract command line are written as PNG at
+# the fastest compression level, onto tmpfs when available. Binarized pages
+# still shrink many times over, which keeps parallel batches within a small
+# /dev/shm (64 MB by default in Docker)
+BATCH_IMAGE_EXT = '.png'
+BATCH_IMAGE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+BATCH_TEMP_ROOT = '/dev/shm' if os.access('/dev/shm', os.W_OK) else None
+
+# In-process Tesseract engine of a worker process, set up by init_worker
+_tess_api = None
+
+# Numbers the batches a process writes into a shared temporary directory
+_batch_ids = itertools.count()
+
+
+def init_worker(log_queue: Optional["multiprocessing.Queue"] = None, level: int = logging.NOTSET) -> None:
+    """Prepare a worker process for OCR.
+
+    Tesseract is limited to a single OpenMP thread so the worker pool controls
+    parallelism. When tesserocr is installed the engine and language model are
+    loaded once here and reused for every image the worker processes.
+
+    Args:
+        log_queue (Optional[multiprocessing.Queue], optional): Queue from
+            worker_log_queue to send log records to the parent process.
+            Defaults to None.
+        level (int, optional): Logging level of the parent process.
+            Defaults to logging.NOTSET.
+    """
+    global _tess_api
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+    if log_queue is not None:
+        root = logging.getLogger()
+        root.handlers = [logging.handlers.QueueHandler(log_queue)]
+        root.setLevel(level)
+
+    if _tess_api is None:
+        _tess_api = create_tess_api()
+
+
+def get_worker_api() -> Optional["PyTessBaseAPI"]:
+    """Get the Tesseract engine init_worker loaded in this process.
+
+    Returns:
+        Optional[PyTessBaseAPI]: The worker's engine, or None outside a
+            worker or without tesserocr
+    """
+    return _tess_api
+
+
+def create_tess_api() -> Optional["PyTessBaseAPI"]:
+    """Load a Tesseract engine configured like TESSERACT_CONFIG.
+
+    The engine can be passed to process_image and ocr_with_boxes to reuse
+    the loaded language model across images. Call End() on it when done.
+
+    Returns:
+        Optional[PyTessBaseAPI]: Tesseract engine, or None if tesserocr is
+            not installed
+    """
+    if PyTessBaseAPI is None:
+        return None
+
+    # Mirror TESSERACT_CONFIG
+    api = PyTessBaseAPI(lang='eng', psm=PSM.SINGLE_BLOCK, oem=OEM.LSTM_ONLY)
+    api.SetVariable('preserve_interword_spaces', '1')
+    api.SetVariable('tessedit_do_invert', '0')
+    return api
+
+
+@contextmanager
+def worker_log_queue() -> Iterator["multiprocessing.Queue"]:
+    """Handle log records of worker processes in this process.
+
+    Pass the queue and this process's level to init_worker. Records arrive
+    at this process's handlers, so workers never contend for the same
+    streams or files.
+
+    Yields:
+        multiprocessing.Queue: Queue the workers send log records to
+    """
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        yield log_queue
+    finally:
+        listener.stop()
+
+
+# Receipt schema enforced on every LLM extraction
+RECEIPT_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "receipt",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "store_name": {"type": "string"},
+                "store_phone": {"type": "string"},
+                "date": {"type": "string"},
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "number": {"type": "integer"},
+                            "price_single": {"type": "number"},
+                            "price_total": {"type": "number"},
+                            "vat_code": {"type": "string"}
+                        },
+                        "required": ["name", "number", "price_single", "price_total", "vat_code"]
+                    }
+                },
+                "sub_total": {"type": "number"},
+                "tax": {"type": "number"},
+                "tip": {"type": "number"},
+                "total": {"type": "number"}
+            },
+            "required": ["store_name", "date", "items", "sub_total", "tax", "tip", "total"]
+        }
+    }
+}
+
+# System instruction sent ahead of every receipt
+SYSTEM_PROMPT = "You are an advanced receipt processing AI. Extract structured data from receipt text and format it according to the specified JSON schema."
+
+# Serialized once with sorted keys so the prompt prefix is byte-identical on
+# every request and the server can reuse its KV cache for it
+RECEIPT_SCHEMA_JSON = json.dumps(
+    RECEIPT_SCHEMA['json_schema']['schema'], sort_keys=True)
+
+# Shared head of every batched prompt, only the receipt text follows it
+RECEIPT_PROMPT_PREFIX = f"{SYSTEM_PROMPT}\n\nJSON schema:\n{RECEIPT_SCHEMA_JSON}\n\n"
+
+# Ends a batched completion once the model starts another receipt after the
+# JSON object, which nothing else prevents on unconstrained backends
+RECEIPT_STOP = ["\n\nReceipt text:"]
+
+
+# Backend-specific request fields that constrain completions to the receipt
+# schema during sampling (vLLM guided decoding, llama.cpp grammars). The
+# completions endpoint has no response_format, so without them the schema
+# is only a prompt instruction
+GUIDED_DECODING = {
+    "vllm": {"guided_json": RECEIPT_SCHEMA['json_schema']['schema']},
+    "llama.cpp": {"json_schema": RECEIPT_SCHEMA['json_schema']['schema']},
+}.get(LLM_BACKEND, {})
+
+
+def _llm_cache_key(text: str) -> str:
+    return ocr_cache.make_key(MODEL_NAME, SCHEMA_VERSION, text)
+
+
+def _check_receipt(data: Any) -> Dict[str, Any]:
+    """Check that an extraction has every field the receipt schema requires.
+
+    Output cut off at max_tokens can still parse once its brackets are
+    closed, but then misses the fields after the cut.
+
+    Args:
+        data (Any): Parsed extraction
+
+    Returns:
+        Dict[str, Any]: The extraction, unchanged
+
+    Raises:
+        ValueError: If the extraction is not an object with all required fields
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Extraction is not a JSON object")
+    required = RECEIPT_SCHEMA['json_schema']['schema']['required']
+    missing = [field for field in required if field not in data]
+    if missing:
+        raise ValueError(f"Extraction is missing required fields: {', '.join(missing)}")
+    return data
+
+
+def _parse_receipt(content: str) -> Dict[str, Any]:
+    return _check_receipt(parse_llm_json(content))
+
+
+def _get_cached_extraction(text: str) -> Optional[Dict[str, Any]]:
+    """Look up a previous extraction for the same text, model and schema.
+
+    Cached entries are revalidated against the schema's required fields and
+    evicted if they no longer match.
+
+    Args:
+        text (str): Cleaned OCR text
+
+    Returns:
+        Optional[Dict[str, Any]]: Cached structured data, or None on a miss
+    """
+    key = _llm_cache_key(text)
+    data = ocr_cache.get_json('llm', key)
+    if data is None:
+        return None
+
+    try:
+        _check_receipt(data)
+    except ValueError:
+        logger.warning("Evicting cached extraction that does not match the schema")
+        ocr_cache.evict('llm', key)
+        return None
+
+    logger.debug("Using cached LLM extraction")
+    return data
+
+
+def warm_up_llm() -> None:
+    """Send the shared prompt prefix once so the server caches its prefill.
+
+    Failures are only logged, since the warm-up is an optimization.
+    """
+    try:
+        _client.completions.create(
+            model=MODEL_NAME,
+            prompt=RECEIPT_PROMPT_PREFIX,
+            max_tokens=1
+        )
+        logger.debug("LLM prompt cache warmed up")
+    except Exception as e:
+        logger.warning(f"LLM warm-up failed: {str(e)}")
 
 
 def process_with_llm(text: str) -> Dict[str, Any]:
@@ -31,66 +340,55 @@ def process_with_llm(text: str) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Structured receipt data in JSON format
     """
+    cached = _get_cached_extraction(text)
+    if cached is not None:
+        return cached
+
     try:
-        # Define the receipt schema
-        receipt_schema = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": "receipt",
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "store_name": {"type": "string"},
-                        "store_phone": {"type": "string"},
-                        "date": {"type": "string"},
-                        "items": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "name": {"type": "string"},
-                                    "number": {"type": "integer"},
-                                    "price_single": {"type": "number"},
-                                    "price_total": {"type": "number"},
-                                    "vat_code": {"type": "string"}
-                                },
-                                "required": ["name", "number", "price_single", "price_total", "vat_code"]
-                            }
-                        },
-                        "sub_total": {"type": "number"},
-                        "tax": {"type": "number"},
-                        "tip": {"type": "number"},
-                        "total": {"type": "number"}
-                    },
-                    "required": ["store_name", "date", "items", "sub_total", "tax", "tip", "total"]
-                }
+        messages = [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": text
             }
-        }
-
-        # Initialize OpenAI client for local LM Studio
-        client = OpenAI(
-            base_url="http://localhost:1234/v1",
-            api_key="lm-studio"
-        )
+        ]
 
         # Create chat completion with schema validation
-        response = client.chat.completions.create(
+        response = _client.chat.completions.create(
             model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an advanced receipt processing AI. Extract structured data from receipt text and format it according to the specified JSON schema."
-                },
-                {
-                    "role": "user",
-                    "content": text
-                }
-            ],
-            response_format=receipt_schema
+            messages=messages,
+            response_format=RECEIPT_SCHEMA,
+            **LLM_SAMPLING
         )
-
-        # Parse the response
-        extracted_json = json.loads(response.choices[0].message.content)
+        content = response.choices[0].message.content
+
+        # Parse the response, asking the model once to fix output that
+        # cannot be recovered locally or is incomplete
+        try:
+            extracted_json = _parse_receipt(content)
+        except ValueError as e:
+            logger.warning(f"Retrying LLM extraction after invalid JSON: {str(e)}")
+            response = _client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=messages + [
+                    {
+                        "role": "assistant",
+                        "content": content
+                    },
+                    {
+                        "role": "user",
+                        "content": f"That was not a valid, complete JSON object for the schema ({str(e)}). Reply with only the corrected JSON object."
+                    }
+                ],
+                response_format=RECEIPT_SCHEMA,
+                **LLM_SAMPLING
+            )
+            extracted_json = _parse_receipt(response.choices[0].message.content)
+
+        ocr_cache.put_json('llm', _llm_cache_key(text), extracted_json)
         return extracted_json
 
     except Exception as e:
@@ -98,120 +396,578 @@ def process_with_llm(text: str) -> Dict[str, Any]:
         raise
 
 
-def preprocess_image(image: np.ndarray) -> np.ndarray:
+async def _complete_concurrently(prompts: List[str]) -> List[Union[str, Exception]]:
+    """Send prompts as concurrent batched completions requests.
+
+    A failed request only fails the prompts of its own batch.
+
+    Args:
+        prompts (List[str]): Complete prompts
+
+    Returns:
+        List[Union[str, Exception]]: Completion text for each prompt, in
+            input order, or the error of the request that carried it
+    """
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    # The async client is bound to this event loop, so it is not shared
+    async with AsyncOpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY) as client:
+        async def complete(batch: List[str]) -> List[str]:
+            async with semaphore:
+                response = await client.completions.create(
+                    model=MODEL_NAME,
+                    prompt=batch,
+                    stop=RECEIPT_STOP,
+                    extra_body=GUIDED_DECODING or None,
+                    **LLM_SAMPLING
+                )
+
+            # Choices may come back in any order, so place them by prompt index
+            contents = [''] * len(batch)
+            for choice in response.choices:
+                contents[choice.index] = choice.text
+            return contents
+
+        batches = [prompts[i:i + LLM_BATCH_SIZE]
+                   for i in range(0, len(prompts), LLM_BATCH_SIZE)]
+        results = await asyncio.gather(
+            *(complete(batch) for batch in batches), return_exceptions=True)
+
+    contents = []
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            logger.error(f"Batched LLM request for {len(batch)} receipts failed: {str(result)}")
+            contents.extend([result] * len(batch))
+        else:
+            contents.extend(result)
+    return contents
+
+
+def process_with_llm_batch(texts: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+    """Extract structured receipt data from several texts with batched LLM requests.
+
+    The texts are sent as list prompts to the completions endpoint, so the
+    server can batch them instead of paying one HTTP round-trip and prefill
+    per receipt. Batches of LLM_BATCH_SIZE texts are submitted concurrently,
+    at most LLM_CONCURRENCY at a time.
+
+    Args:
+        texts (List[str]): Cleaned OCR texts
+
+    Returns:
+        List[Union[Dict[str, Any], Exception]]: Structured receipt data for
+            each text, in input order, or the error for texts that failed
+    """
+    results = [_get_cached_extraction(text) for text in texts]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    try:
+        prompts = [
+            f"{RECEIPT_PROMPT_PREFIX}Receipt text:\n{texts[i]}\n\nJSON:\n"
+            for i in missing
+        ]
+        contents = asyncio.run(_complete_concurrently(prompts))
+
+        for i, content in zip(missing, contents):
+            if isinstance(content, Exception):
+                results[i] = content
+                continue
+            try:
+                results[i] = _parse_receipt(content)
+            except ValueError as e:
+                # Fall back to a schema-enforced chat request for this text,
+                # a failure there only fails this receipt
+                logger.warning(f"Re-extracting receipt {i} after invalid output: {str(e)}")
+                try:
+                    results[i] = process_with_llm(texts[i])
+                except Exception as fallback_error:
+                    results[i] = fallback_error
+                continue
+            ocr_cache.put_json('llm', _llm_cache_key(texts[i]), results[i])
+
+        return results
+
+    except Exception as e:
+        logger.error(f"Batched LLM processing failed: {str(e)}")
+        raise
+
+
+def needs_extraction(response: Dict[str, Any]) -> bool:
+    """Check whether an OCR response is a document type the LLM extracts.
+
+    Args:
+        response (Dict[str, Any]): Response built by build_result
+
+    Returns:
+        bool: True for receipts and invoices
+    """
+    return response["classification"]["type"].lower() in ['receipt', 'invoice']
+
+
+def extract_structured_data(responses: List[Dict[str, Any]]) -> None:
+    """Add structured data to several OCR responses with batched LLM calls.
+
+    Args:
+        responses (List[Dict[str, Any]]): Responses built with
+            build_result(..., extract=False), updated in place
+    """
+    pending = [response for response in responses if needs_extraction(response)]
+    if not pending:
+        return
+
+    try:
+        structured_data = process_with_llm_batch(
+            [response["cleaned_text"] for response in pending])
+    except Exception as e:
+        for response in pending:
+            response["error"] = f"LLM processing failed: {str(e)}"
+        return
+
+    for response, data in zip(pending, structured_data):
+        if isinstance(data, Exception):
+            response["error"] = f"LLM processing failed: {str(data)}"
+        else:
+            response["structured_data"] = data
+
+
+def preprocess_image(gray: np.ndarray, max_side: Optional[int] = MAX_OCR_SIDE) -> np.ndarray:
     """Apply preprocessing steps to improve OCR accuracy.
 
     Args:
-        image (np.ndarray): Input image
+        gray (np.ndarray): Grayscale input image
+        max_side (Optional[int], optional): Longest side to downscale photos
+            to, or None to keep the resolution, e.g. for pages rendered at
+            a chosen DPI. Defaults to MAX_OCR_SIDE.
 
     Returns:
-        np.ndarray: Preprocessed image
+        np.ndarray: Preprocessed single-channel image
     """
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    # Downscale large photos, OCR cost grows with the pixel count while
+    # receipt text stays legible well below phone camera resolutions
+    h, w = gray.shape[:2]
+    scale = min(1.0, max_side / max(h, w)) if max_side else 1.0
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                          interpolation=cv2.INTER_AREA)
+
+    # Apply adaptive thresholding to handle uneven lighting conditions
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10)
 
-    # Apply thresholding to handle different lighting conditions
-    gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    # Noise removal with a single small morphological opening
+    return cv2.morphologyEx(binary, cv2.MORPH_OPEN, OPENING_KERNEL)
 
-    # Noise removal
-    gray = cv2.medianBlur(gray, 3)
 
-    # Dilation to make text more prominent
-    kernel = np.ones((1, 1), np.uint8)
-    gray = cv2.dilate(gray, kernel, iterations=1)
+def read_grayscale(source: ImageSource) -> np.ndarray:
+    """Get a grayscale array from an image file or an in-memory image.
+
+    Args:
+        source (ImageSource): Path to the image file, PIL image or numpy array
 
+    Returns:
+        np.ndarray: Grayscale image
+    """
+    if isinstance(source, Image.Image):
+        return np.asarray(source.convert('L'))
+
+    if isinstance(source, np.ndarray):
+        if source.ndim == 3:
+            return cv2.cvtColor(source, cv2.COLOR_RGB2GRAY)
+        return source
+
+    # Decode straight to grayscale, no color image is ever materialized
+    logger.debug("Reading image with OpenCV")
+    gray = cv2.imread(source, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        logger.error(f"Failed to read image: {source}")
+        raise ValueError(f"Could not read image: {source}")
     return gray
 
 
-def process_image(image_path: str) -> Dict[str, Any]:
-    """Process an image file and extract text using OCR.
+def load_image(source: ImageSource) -> np.ndarray:
+    """Read an image and apply OCR preprocessing.
 
     Args:
-        image_path (str): Path to the image file
+        source (ImageSource): Path to the image file, PIL image or numpy array
 
     Returns:
-        Dict[str, Any]: Dictionary containing OCR results with text
+        np.ndarray: Preprocessed image
     """
-    start_time = time.time()
-    logger.info(f"Starting image processing: {image_path}")
+    gray = read_grayscale(source)
+
+    # Apply preprocessing
+    logger.debug("Applying image preprocessing")
+    return preprocess_image(gray)
+
 
+def _prefetch_images(image_paths: List[str]) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+    """Load and preprocess images on a background thread ahead of the consumer.
+
+    OpenCV releases the GIL while decoding, so reading the next images
+    overlaps with recognizing the current one. At most IMAGE_PREFETCH
+    images are held in memory ahead of the consumer.
+
+    Args:
+        image_paths (List[str]): Paths to the image files
+
+    Yields:
+        Tuple[str, Optional[np.ndarray]]: Image path and preprocessed image,
+            or None if the image could not be read
+    """
+    def load(image_path: str) -> Optional[np.ndarray]:
+        try:
+            return load_image(image_path)
+        except (ValueError, cv2.error):
+            return None
+
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = deque()
+        for image_path in image_paths:
+            pending.append((image_path, reader.submit(load, image_path)))
+            if len(pending) > IMAGE_PREFETCH:
+                ready_path, future = pending.popleft()
+                yield ready_path, future.result()
+        while pending:
+            ready_path, future = pending.popleft()
+            yield ready_path, future.result()
+
+
+def _ocr_files(image_paths: List[str], temp_dir: Optional[str] = None) -> Dict[str, str]:
+    """Extract text from several image files with a single Tesseract engine.
+
+    Inside a worker with a tesserocr engine (see init_worker) the images are
+    recognized in-process. Otherwise Tesseract is given a text file listing
+    one image per line, so the engine and language model are still loaded
+    once for the whole batch instead of once per image.
+
+    Args:
+        image_paths (List[str]): Paths to the image files
+        temp_dir (Optional[str], optional): Existing directory to write the
+            batch files to, shared with other batches. Defaults to a
+            directory created and removed for this batch.
+
+    Returns:
+        Dict[str, str]: Raw OCR text keyed by image path. Images that could
+            not be read are logged and left out.
+    """
+    if _tess_api is not None:
+        texts = {}
+        for image_path, processed_image in _prefetch_images(image_paths):
+            if processed_image is None:
+                continue
+            texts[image_path] = _recognize(processed_image, _tess_api)
+        return texts
+
+    if temp_dir is None:
+        with tempfile.TemporaryDirectory(dir=BATCH_TEMP_ROOT) as own_temp_dir:
+            return _ocr_files_in(image_paths, own_temp_dir, '')
+
+    # Only remove this batch's files; the directory is shared
+    prefix = f"{os.getpid()}_{next(_batch_ids)}_"
     try:
-        # Read image using OpenCV
-        logger.debug("Reading image with OpenCV")
-        image = cv2.imread(image_path)
-        if image is None:
-            logger.error(f"Failed to read image: {image_path}")
-            raise ValueError(f"Could not read image: {image_path}")
-
-        # Convert BGR to RGB
-        logger.debug("Converting BGR to RGB")
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # Apply preprocessing
-        logger.debug("Applying image preprocessing")
-        processed_image = preprocess_image(image)
-
-        # Perform OCR with improved configuration
-        logger.info("Performing OCR on image")
-        config = (
-            '--oem 3 '  # Use LSTM OCR Engine Mode
-            '--psm 1 --psm 3 --psm 4 '
-            '-l eng '   # English language
-            '--dpi 500 '  # Set DPI for better accuracy
-            '-c preserve_interword_spaces=1 '  # Preserve word spacing
-            '-c tessedit_do_invert=0 '  # Don't invert colors
-            '-c textord_heavy_nr=1 '  # Reduce noise removal aggressiveness
-            'pdftotext '
-            '-c tessedit_create_txt=1 '  # Create text output
+        return _ocr_files_in(image_paths, temp_dir, prefix)
+    finally:
+        with os.scandir(temp_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix):
+                    os.remove(entry.path)
 
 
-        )
-        text = pytesseract.image_to_string(processed_image, config=config)
-
-        # Store raw OCR text
-        raw_text = text
-
-        # Clean up and format the extracted text
-        text_lines = [line.strip()
-                      for line in text.split('\n') if line.strip()]
-        formatted_text = ' '.join(text_lines)
-
-        # Clean and normalize the text
-        cleaned_text = text_processor.clean_text(raw_text)
-
-        # Classify the document
-        doc_type, confidence = text_processor.classify_document(cleaned_text)
-        logger.info(
-            f"Document classified as: {doc_type} with confidence: {confidence:.2f}")
-
-        total_time = time.time() - start_time
-        logger.info(f"Image processing completed in {total_time:.2f} seconds")
-
-        # Prepare the response
-        response = {
-            "raw_text": raw_text,
-            "cleaned_text": cleaned_text,
-            "classification": {
-                "type": doc_type,
-                "confidence": confidence
-            },
-            "processing_info": {
-                "processing_time": total_time
-            }
+def _ocr_files_in(image_paths: List[str], temp_dir: str, prefix: str) -> Dict[str, str]:
+    """Extract text from several image files in one Tesseract command line run.
+
+    Args:
+        image_paths (List[str]): Paths to the image files
+        temp_dir (str): Directory for the preprocessed images and list file
+        prefix (str): Prefix of the names of the files written to temp_dir
+
+    Returns:
+        Dict[str, str]: Raw OCR text keyed by image path. Images that could
+            not be read are logged and left out.
+    """
+    # Preprocess every image and write it where Tesseract can read it
+    batch_paths = []
+    temp_image_paths = []
+    for image_path, processed_image in _prefetch_images(image_paths):
+        if processed_image is None:
+            continue
+        temp_image_path = os.path.join(
+            temp_dir, f'{prefix}image_{len(batch_paths)}{BATCH_IMAGE_EXT}')
+        if not cv2.imwrite(temp_image_path, processed_image, BATCH_IMAGE_PARAMS):
+            raise OSError(f"Could not write temporary OCR image: {temp_image_path}")
+        batch_paths.append(image_path)
+        temp_image_paths.append(temp_image_path)
+
+    if not batch_paths:
+        return {}
+
+    list_path = os.path.join(temp_dir, f'{prefix}images.txt')
+    with open(list_path, 'w') as f:
+        f.write('\n'.join(temp_image_paths) + '\n')
+
+    logger.info(
+        f"Performing OCR on {len(batch_paths)} images in one Tesseract run")
+    text = pytesseract.image_to_string(list_path, config=TESSERACT_CONFIG)
+
+    # Split the combined output back into one text per image
+    pages = text.split(PAGE_SEPARATOR)
+    if len(pages) < len(batch_paths):
+        raise RuntimeError(
+            f"Expected {len(batch_paths)} pages from Tesseract, got {len(pages)}")
+
+    return dict(zip(batch_paths, pages))
+
+
+def _ocr_cache_key(image_path: str) -> str:
+    return ocr_cache.make_key(ocr_cache.file_digest(image_path), PREPROC_VERSION, TESSERACT_CONFIG)
+
+
+def ocr_batch(image_paths: List[str], temp_dir: Optional[str] = None) -> Dict[str, str]:
+    """Extract text from several image files, reusing cached results.
+
+    Images whose content was already OCR'd with the same preprocessing and
+    Tesseract configuration are served from the cache; the rest are
+    recognized together by _ocr_files.
+
+    Args:
+        image_paths (List[str]): Paths to the image files
+        temp_dir (Optional[str], optional): Existing directory for temporary
+            batch files, see _ocr_files. Defaults to None.
+
+    Returns:
+        Dict[str, str]: Raw OCR text keyed by image path. Images that could
+            not be read are logged and left out.
+    """
+    texts = {}
+    keys = {}
+    for image_path in image_paths:
+        try:
+            keys[image_path] = _ocr_cache_key(image_path)
+        except OSError as e:
+            logger.error(f"Failed to read image: {image_path}: {str(e)}")
+            continue
+        text = ocr_cache.get_text('ocr', keys[image_path])
+        if text is not None:
+            texts[image_path] = text
+
+    pending = [image_path for image_path in keys if image_path not in texts]
+    if pending:
+        recognized = _ocr_files(pending, temp_dir)
+        for image_path, text in recognized.items():
+            ocr_cache.put_text('ocr', keys[image_path], text)
+        texts.update(recognized)
+
+    return texts
+
+
+def _recognize(processed_image: np.ndarray, api: Optional["PyTessBaseAPI"]) -> str:
+    """Extract text from a preprocessed image.
+
+    Args:
+        processed_image (np.ndarray): Preprocessed image
+        api (Optional[PyTessBaseAPI]): Tesseract engine to use, or None to
+            run the Tesseract command line
+
+    Returns:
+        str: Raw OCR text
+    """
+    if api is not None:
+        api.SetImage(Image.fromarray(processed_image))
+        return api.GetUTF8Text()
+    return pytesseract.image_to_string(
+        Image.fromarray(processed_image), config=TESSERACT_CONFIG)
+
+
+def _read_words(processed_image: np.ndarray, api: Optional["PyTessBaseAPI"]) -> Tuple[List[List[str]], np.ndarray, np.ndarray]:
+    """Recognize the words of a preprocessed image with their positions.
+
+    Args:
+        processed_image (np.ndarray): Preprocessed image
+        api (Optional[PyTessBaseAPI]): Tesseract engine to use, or None to
+            run the Tesseract command line
+
+    Returns:
+        Tuple[List[List[str]], np.ndarray, np.ndarray]: Words grouped by
+            line in reading order, an (N, 4) float array of [x1, y1, x2, y2]
+            word boxes and an array of word confidences
+    """
+    if api is not None:
+        lines = []
+        rects = []
+        confidences = []
+        api.SetImage(Image.fromarray(processed_image))
+        api.Recognize()
+        for word_iterator in iterate_level(api.GetIterator(), RIL.WORD):
+            word = word_iterator.GetUTF8Text(RIL.WORD)
+            rect = word_iterator.BoundingBox(RIL.WORD)
+            if not word or not word.strip() or rect is None:
+                continue
+            if not lines or word_iterator.IsAtBeginningOf(RIL.TEXTLINE):
+                lines.append([])
+            lines[-1].append(word)
+            rects.append(rect)
+            confidences.append(word_iterator.Confidence(RIL.WORD))
+        return (lines, np.asarray(rects, dtype=np.float64).reshape(-1, 4),
+                np.asarray(confidences, dtype=np.float64))
+
+    data = pytesseract.image_to_data(
+        Image.fromarray(processed_image), config=TESSERACT_CONFIG,
+        output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    indices = []
+    for i, word in enumerate(data['text']):
+        if not word.strip():
+            continue
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(line_key, []).append(word)
+        indices.append(i)
+
+    left = np.asarray(data['left'], dtype=np.float64)[indices]
+    top = np.asarray(data['top'], dtype=np.float64)[indices]
+    width = np.asarray(data['width'], dtype=np.float64)[indices]
+    height = np.asarray(data['height'], dtype=np.float64)[indices]
+    rects = np.stack([left, top, left + width, top + height], axis=1)
+    confidences = np.asarray(data['conf'], dtype=np.float64)[indices]
+    return list(lines.values()), rects, confidences
+
+
+def ocr_with_boxes(source: ImageSource, api: Optional["PyTessBaseAPI"] = None) -> Dict[str, Any]:
+    """Extract text and word bounding boxes from a page image.
+
+    Args:
+        source (ImageSource): Path to the page image, PIL image or numpy array
+        api (Optional[PyTessBaseAPI], optional): Tesseract engine to reuse,
+            see create_tess_api. Defaults to the worker's engine if any.
+
+    Returns:
+        Dict[str, Any]: Page text and word boxes as Boxes columns, with box
+            coordinates in pixels of the input image, clipped to its bounds
+    """
+    gray = read_grayscale(source)
+
+    # Pages are rendered at the DPI they should be read at; the photo
+    # downscale would throw away the resolution asked for
+    processed_image = preprocess_image(gray, max_side=None)
+
+    # Map boxes back through any downscaling done by preprocessing
+    scale = gray.shape[1] / processed_image.shape[1]
+
+    lines, bbox, confidence = _read_words(processed_image, api or _tess_api)
+    words = [word for line_words in lines for word in line_words]
+
+    # Clip boxes to the page and drop those left without area
+    height_px, width_px = gray.shape[:2]
+    bbox = np.rint(bbox * scale).astype(np.int32)
+    np.clip(bbox[:, 0::2], 0, width_px, out=bbox[:, 0::2])
+    np.clip(bbox[:, 1::2], 0, height_px, out=bbox[:, 1::2])
+    keep = (bbox[:, 2] > bbox[:, 0]) & (bbox[:, 3] > bbox[:, 1])
+
+    # Rebuild the page text line by line in reading order
+    text = '\n'.join(' '.join(line_words) for line_words in lines)
+
+    return {
+        "text": text,
+        "boxes": {
+            "text": [word for word, kept in zip(words, keep.tolist()) if kept],
+            "bbox": bbox[keep],
+            "confidence": confidence[keep]
         }
+    }
+
 
-        # Process with LLM if document is receipt or invoice
-        if doc_type.lower() in ['receipt', 'invoice']:
+def build_result(raw_text: str, start_time: float, extract: bool = True) -> Dict[str, Any]:
+    """Clean, classify and extract structured data from raw OCR text.
+
+    Args:
+        raw_text (str): Raw OCR text
+        start_time (float): Time at which processing of the document started
+        extract (bool, optional): Run LLM extraction for receipts and invoices.
+            Disable to batch extraction with extract_structured_data. Defaults to True.
+
+    Returns:
+        Dict[str, Any]: Dictionary containing OCR results with text
+    """
+    # Clean up and format the extracted text
+    text_lines = [line.strip()
+                  for line in raw_text.split('\n') if line.strip()]
+    formatted_text = ' '.join(text_lines)
+
+    # Clean and normalize the text
+    cleaned_text = text_processor.clean_text(raw_text)
+
+    # Classify the document
+    doc_type, confidence = text_processor.classify_document(cleaned_text)
+    logger.info(
+        f"Document classified as: {doc_type} with confidence: {confidence:.2f}")
+
+    total_time = time.time() - start_time
+    logger.info(f"Image processing completed in {total_time:.2f} seconds")
+
+    # Prepare the response
+    response = {
+        "raw_text": raw_text,
+        "cleaned_text": cleaned_text,
+        "classification": {
+            "type": doc_type,
+            "confidence": confidence
+        },
+        "processing_info": {
+            "processing_time": total_time
+        }
+    }
+
+    # Process with LLM if document is receipt or invoice
+    if doc_type.lower() in ['receipt', 'invoice']:
+        if extract:
             try:
                 structured_data = process_with_llm(cleaned_text)
                 response["structured_data"] = structured_data
             except Exception as e:
                 logger.error(f"LLM processing failed: {str(e)}")
                 response["error"] = f"LLM processing failed: {str(e)}"
+    else:
+        response["error"] = f"Document type '{doc_type}' is not supported for structured data extraction"
+
+    return response
+
+
+def process_image(source: ImageSource, api: Optional["PyTessBaseAPI"] = None) -> Dict[str, Any]:
+    """Process an image and extract text using OCR.
+
+    Args:
+        source (ImageSource): Path to the image file, or an in-memory PIL
+            image or numpy array such as a rendered PDF page
+        api (Optional[PyTessBaseAPI], optional): Tesseract engine to reuse,
+            see create_tess_api. Defaults to the worker's engine if any.
+
+    Returns:
+        Dict[str, Any]: Dictionary containing OCR results with text
+    """
+    start_time = time.time()
+    is_file = isinstance(source, str)
+    logger.info(
+        f"Starting image processing: {source if is_file else 'in-memory image'}")
+
+    try:
+        # Reuse the OCR text of an identical image file from a previous run
+        key = _ocr_cache_key(source) if is_file else None
+        text = ocr_cache.get_text('ocr', key) if is_file else None
+
+        if text is None:
+            processed_image = load_image(source)
+
+            # Perform OCR with improved configuration
+            logger.info("Performing OCR on image")
+            text = _recognize(processed_image, api or _tess_api)
+            if is_file:
+                ocr_cache.put_text('ocr', key, text)
         else:
-            response["error"] = f"Document type '{doc_type}' is not supported for structured data extraction"
+            logger.info("Using cached OCR text")
 
-        return response
+        return build_result(text, start_time)
 
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
@@ -1,8 +1,9 @@
 from typing import Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-import json
 from type import AgentState
+from http_client import HTTP_CLIENT
+from llm_json import parse_llm_json
 
 
 class StructuredDataExtractor:
@@ -15,6 +16,15 @@ class StructuredDataExtractor:
                 "schema": {
                     "type": "object",
                     "properties": {
+                        "document_type": {
+                            "type": "string",
+                            "enum": ["receipt", "invoice", "other"]
+                        },
+                        "confidence": {
+                            "type": "number",
+                            "minimum": 0,
+                            "maximum": 1
+                        },
                         "store_name": {"type": "string"},
                         "store_phone": {"type": "string"},
                         "date": {"type": "string"},
@@ -37,7 +47,7 @@ class StructuredDataExtractor:
                         "tip": {"type": "number"},
                         "total": {"type": "number"}
                     },
-                    "required": ["store_name", "date", "items", "sub_total", "tax", "tip", "total"]
+                    "required": ["document_type", "confidence", "store_name", "date", "items", "sub_total", "tax", "tip", "total"]
                 }
             }
         }
@@ -45,28 +55,45 @@ class StructuredDataExtractor:
         self.model = ChatOpenAI(
             base_url="http://localhost:1234/v1",
             api_key="lm-studio",
+            http_client=HTTP_CLIENT,
             model_name="fused_3b",
+            temperature=0,
+            max_tokens=1024,
             model_kwargs={"response_format": self.receipt_schema}
         )
+        # Classification and extraction share one request to save a round-trip
         self.prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an advanced receipt processing AI. Extract structured data from receipt text and format it according to the specified JSON schema."),
-            ("user", "{text}\n\nDocument type: {doc_type}")
+            ("system", "You are an advanced document processing AI. Classify the document as 'receipt', 'invoice' or 'other' with a confidence between 0 and 1, AND extract structured data from its text according to the specified JSON schema. If the document type is 'other', return empty items and zero amounts."),
+            ("user", "{text}")
         ])
 
     def extract_data(self, state: AgentState) -> AgentState:
         try:
-            if state.get('error') or state['classification']['type'] == 'other':
-                state['error'] = "Document type 'other' is not supported for structured data extraction"
+            if state.get('error'):
                 return state
 
             response = self.model.invoke(
-                self.prompt.format_messages(
-                    text=state['cleaned_text'],
-                    doc_type=state['classification']['type']
-                )
+                self.prompt.format_messages(text=state['cleaned_text'])
             )
 
-            state['structured_data'] = json.loads(response.content)
+            # Split the classification fields from the extracted data, keeping
+            # a classification made upstream without the LLM
+            data = parse_llm_json(response.content)
+            document_type = data.pop('document_type', None)
+            confidence = data.pop('confidence', None)
+            if not state.get('classification'):
+                if document_type is None or confidence is None:
+                    raise ValueError("Response is missing the document classification")
+                state['classification'] = {
+                    'type': document_type,
+                    'confidence': confidence
+                }
+
+            if state['classification']['type'] == 'other':
+                state['error'] = "Document type 'other' is not supported for structured data extraction"
+                return state
+
+            state['structured_data'] = data
             return state
         except Exception as e:
             state['error'] = f"Data extraction failed: {str(e)}"
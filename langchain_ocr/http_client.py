@@ -0,0 +1,7 @@
+import httpx
+
+# Shared by every ChatOpenAI model so keep-alive connections to LM Studio
+# persist across documents instead of each model opening its own pool
+HTTP_CLIENT = httpx.Client(
+    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+)
@@ -0,0 +1,76 @@
+from typing import Any
+import orjson
+
+
+def _close_brackets(text: str) -> str:
+    """Close the strings, objects and arrays left open by a truncated answer.
+
+    Args:
+        text (str): JSON text starting at its opening bracket
+
+    Returns:
+        str: Text with the missing closing characters appended
+    """
+    closers = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            closers.append('}')
+        elif char == '[':
+            closers.append(']')
+        elif char in '}]' and closers:
+            closers.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(',')
+    return text + ''.join(reversed(closers))
+
+
+def parse_llm_json(content: str) -> Any:
+    """Parse a JSON object produced by an LLM, recovering from near-misses.
+
+    Text around the object (prose, code fences) is stripped and brackets left
+    open by a truncated answer are closed before giving up.
+
+    Args:
+        content (str): Raw model output
+
+    Returns:
+        Any: Parsed JSON value
+
+    Raises:
+        ValueError: If no JSON object can be recovered
+    """
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        pass
+
+    start = content.find('{')
+    if start == -1:
+        raise ValueError("No JSON object found in LLM output")
+
+    # Drop everything outside the outermost braces
+    end = content.rfind('}')
+    if end > start:
+        try:
+            return orjson.loads(content[start:end + 1])
+        except orjson.JSONDecodeError:
+            pass
+
+    # Treat the answer as truncated and balance its brackets
+    try:
+        return orjson.loads(_close_brackets(content[start:]))
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Could not recover JSON from LLM output: {str(e)}")
@@ -2,7 +2,6 @@ import argparse
 from typing import Dict, Any
 from langgraph.graph import Graph, END, START
 from ocr_processor import OCRProcessor
-from document_classifier import DocumentClassifier
 from data_extractor import StructuredDataExtractor
 from type import AgentState
 
@@ -10,7 +9,6 @@ from type import AgentState
 class OCRPipeline:
     def __init__(self):
         self.ocr_processor = OCRProcessor()
-        self.document_classifier = DocumentClassifier()
         self.data_extractor = StructuredDataExtractor()
 
     def process_image(self, image_path: str) -> Dict[str, Any]:
@@ -26,10 +24,10 @@ class OCRPipeline:
 
         # Process through pipeline
         state = self.ocr_processor.process_image(state)
+        state = self.ocr_processor.classify_document(state)
         if not state.get('error'):
-            state = self.document_classifier.classify_document(state)
-            if not state.get('error'):
-                state = self.data_extractor.extract_data(state)
+            # Also classifies the document if the local classifier was unsure
+            state = self.data_extractor.extract_data(state)
 
         return state
 
@@ -37,30 +35,21 @@ class OCRPipeline:
 def create_ocr_graph() -> Graph:
     # Initialize processors
     ocr = OCRProcessor()
-    classifier = DocumentClassifier()
     extractor = StructuredDataExtractor()
 
     # Define the workflow
     workflow = Graph()
 
-    # Add nodes
+    # Add nodes; extraction also classifies documents the local classifier
+    # was unsure about
     workflow.add_node("ocr", ocr.process_image)
-    workflow.add_node("classify", classifier.classify_document)
+    workflow.add_node("classify", ocr.classify_document)
     workflow.add_node("extract", extractor.extract_data)
 
-    # Define conditional edges
-    def should_extract(state: AgentState) -> str:
-        if state.get('error') or state['classification'].get('type') == 'other':
-            return END
-        return "extract"
-
-    # Define edges with conditions
+    # Define edges
     workflow.add_edge(START, "ocr")
     workflow.add_edge("ocr", "classify")
-    workflow.add_conditional_edges(
-        "classify",
-        should_extract
-    )
+    workflow.add_edge("classify", "extract")
     workflow.add_edge("extract", END)
 
     # Compile the graph
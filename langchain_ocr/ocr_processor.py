@@ -4,6 +4,9 @@ import pytesseract
 from text_processor import TextProcessor
 from type import AgentState
 
+# Local classifications above this confidence skip the LLM classification
+LOCAL_CONFIDENCE_THRESHOLD = 0.75
+
 
 class OCRProcessor:
     def __init__(self):
@@ -14,15 +17,11 @@ class OCRProcessor:
             # Use Tesseract OCR
             image = Image.open(state['image_path'])
             config = (
-                '--oem 3 '  # Use LSTM OCR Engine Mode
-                '--psm 1 --psm 3 --psm 4 '
+                '--oem 1 '  # LSTM engine only, the legacy model is never loaded
+                '--psm 6 '  # Assume a single uniform block of text, as on receipts
                 '-l eng '   # English language
-                '--dpi 500 '  # Set DPI for better accuracy
                 '-c preserve_interword_spaces=1 '  # Preserve word spacing
-                '-c tessedit_do_invert=0 '  # Don't invert colors
-                '-c textord_heavy_nr=1 '  # Reduce noise removal aggressiveness
-                'pdftotext '
-                '-c tessedit_create_txt=1 '  # Create text output
+                '-c tessedit_do_invert=0'  # Don't invert colors
             )
             text = pytesseract.image_to_string(image, config=config)
 
@@ -32,3 +31,19 @@ class OCRProcessor:
         except Exception as e:
             state['error'] = f"OCR processing failed: {str(e)}"
             return state
+
+    def classify_document(self, state: AgentState) -> AgentState:
+        if state.get('error'):
+            return state
+
+        # Trust the local keyword classifier when it confidently finds a
+        # receipt or invoice. 'other' only means neither score was high
+        # enough, so those documents are left for the LLM to classify
+        doc_type, confidence = self.text_processor.classify_document(
+            state['cleaned_text'])
+        if doc_type != 'other' and confidence > LOCAL_CONFIDENCE_THRESHOLD:
+            state['classification'] = {
+                'type': doc_type,
+                'confidence': confidence
+            }
+        return state
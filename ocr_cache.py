@@ -0,0 +1,227 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Optional
+
+try:
+    from blake3 import blake3 as _new_hash
+except ImportError:
+    _new_hash = hashlib.sha256
+
+logger = logging.getLogger(__name__)
+
+# Root directory of the content-addressed cache
+CACHE_DIR = os.environ.get("OCR_CACHE_DIR", ".cache")
+
+# Total size of all namespaces that prune() trims the cache down to, least
+# recently used entries first
+MAX_CACHE_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", 1 << 30))
+
+# Files above this size are identified by their stat and sampled head and
+# tail bytes instead of being read in full
+FULL_HASH_LIMIT = 256 << 20
+SAMPLE_SIZE = 1 << 20
+
+
+def make_key(*parts: str) -> str:
+    """Build a cache key from the inputs that determine a cached value.
+
+    Args:
+        *parts (str): Values identifying the cached entry, e.g. model and input text
+
+    Returns:
+        str: Hex SHA-256 digest of the joined parts
+    """
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def file_digest(file_path: str) -> str:
+    """Hash a file's content.
+
+    BLAKE3 is used when installed, SHA-256 otherwise. Files larger than
+    FULL_HASH_LIMIT are hashed from their size, modification time and first
+    and last SAMPLE_SIZE bytes. The digest is remembered under the file's
+    path, size and modification time, so unchanged files are not read again
+    on later runs.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    stat = os.stat(file_path)
+    stat_key = make_key(os.path.abspath(file_path),
+                        str(stat.st_size), str(stat.st_mtime_ns))
+    digest = get_json('digests', stat_key)
+    if digest is not None:
+        return digest
+
+    hasher = _new_hash()
+    with open(file_path, 'rb') as f:
+        if stat.st_size > FULL_HASH_LIMIT:
+            hasher.update(f"{stat.st_size}|{stat.st_mtime_ns}|".encode("utf-8"))
+            hasher.update(f.read(SAMPLE_SIZE))
+            f.seek(-SAMPLE_SIZE, os.SEEK_END)
+            hasher.update(f.read(SAMPLE_SIZE))
+        else:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    put_json('digests', stat_key, digest)
+    return digest
+
+
+def _cache_path(namespace: str, key: str, ext: str = 'json') -> str:
+    return os.path.join(CACHE_DIR, namespace, f"{key}.{ext}")
+
+
+def _touch(path: str) -> None:
+    # Mark an entry as recently used for prune()
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """Write a cache file atomically.
+
+    The content is written to a temporary file first and then renamed, so
+    concurrent readers never see a partial file.
+
+    Args:
+        path (str): Cache file path
+        content (str): File content
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write cache entry {path}: {str(e)}")
+
+
+def get_json(namespace: str, key: str) -> Optional[Any]:
+    """Load a cached JSON value.
+
+    Args:
+        namespace (str): Cache namespace, e.g. 'llm'
+        key (str): Cache key
+
+    Returns:
+        Optional[Any]: Cached value, or None on a miss or unreadable entry
+    """
+    path = _cache_path(namespace, key)
+    try:
+        with open(path) as f:
+            value = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+        evict(namespace, key)
+        return None
+    _touch(path)
+    return value
+
+
+def put_json(namespace: str, key: str, value: Any) -> None:
+    """Store a JSON value in the cache.
+
+    Args:
+        namespace (str): Cache namespace, e.g. 'llm'
+        key (str): Cache key
+        value (Any): JSON-serializable value
+    """
+    _write_atomic(_cache_path(namespace, key), json.dumps(value))
+
+
+def get_text(namespace: str, key: str) -> Optional[str]:
+    """Load a cached text value.
+
+    Args:
+        namespace (str): Cache namespace, e.g. 'ocr'
+        key (str): Cache key
+
+    Returns:
+        Optional[str]: Cached text, or None on a miss
+    """
+    path = _cache_path(namespace, key, 'txt')
+    try:
+        with open(path, encoding='utf-8') as f:
+            value = f.read()
+    except FileNotFoundError:
+        return None
+    _touch(path)
+    return value
+
+
+def put_text(namespace: str, key: str, value: str) -> None:
+    """Store a text value in the cache.
+
+    Args:
+        namespace (str): Cache namespace, e.g. 'ocr'
+        key (str): Cache key
+        value (str): Text to store
+    """
+    _write_atomic(_cache_path(namespace, key, 'txt'), value)
+
+
+def evict(namespace: str, key: str) -> None:
+    """Remove an entry from the cache if present.
+
+    Args:
+        namespace (str): Cache namespace, e.g. 'llm'
+        key (str): Cache key
+    """
+    try:
+        os.remove(_cache_path(namespace, key))
+    except FileNotFoundError:
+        pass
+
+
+def prune(max_bytes: int = MAX_CACHE_BYTES) -> int:
+    """Remove the least recently used entries until the cache fits in max_bytes.
+
+    Entries of all namespaces are ordered by modification time, which reads
+    refresh, so entries that keep being hit survive.
+
+    Args:
+        max_bytes (int, optional): Size to trim the cache to. Defaults to
+            MAX_CACHE_BYTES.
+
+    Returns:
+        int: Number of entries removed
+    """
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.info(f"Pruned {removed} cache entries to fit in {max_bytes} bytes")
+    return removed
@@ -1,84 +1,424 @@
-from typing import Dict, List, Any
-from pdf2image import convert_from_path
-from image_processor import process_image
-import tempfile
+from typing import Dict, List, Any, Tuple, Optional, Iterator, Callable, TYPE_CHECKING
+from collections import deque
+from functools import partial
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from image_processor import ocr_with_boxes, init_worker, create_tess_api, get_worker_api, worker_log_queue, ImageSource, Boxes
+import cv2
+import numpy as np
+from PIL import UnidentifiedImageError
+from pytesseract import TesseractError
 import os
 import logging
 import time
 
-# Configure logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# PyMuPDF counts pages in-process; pdf2image starts a pdfinfo process
+HAS_PYMUPDF = pymupdf is not None
+
+if TYPE_CHECKING:
+    from tesserocr import PyTessBaseAPI
+
 logger = logging.getLogger(__name__)
 
-def process_pdf(pdf_path: str, dpi: int = 300) -> Dict[str, Any]:
+# Pages rendered ahead of OCR when a multi-page PDF is processed in place,
+# as folder workers do
+RENDER_AHEAD = 2
+
+# Adaptive render DPI: scanned pages are rendered slightly above the
+# resolution of their embedded images, pages without an image covering at
+# least MIN_IMAGE_COVERAGE of the page at NO_IMAGE_DPI, never below
+# MIN_RENDER_DPI or above the requested DPI
+NATIVE_DPI_MARGIN = 1.2
+NO_IMAGE_DPI = 200
+MIN_RENDER_DPI = 150
+MIN_IMAGE_COVERAGE = 0.5
+
+def _render_dpi(page: "pymupdf.Page", dpi: int) -> int:
+    """Choose the DPI to render a page at from its embedded images.
+
+    Rendering above the resolution of a scanned page only adds pixels for
+    OCR to process without adding detail. Small images such as logos do not
+    count, the text around them is vector content that needs NO_IMAGE_DPI.
+
+    Args:
+        page (pymupdf.Page): PDF page
+        dpi (int): Requested DPI, used as the upper bound
+
+    Returns:
+        int: DPI to render the page at
+    """
+    native_dpi = 0
+    min_area = page.rect.get_area() * MIN_IMAGE_COVERAGE
+    for image in page.get_images(full=True):
+        bbox = page.get_image_bbox(image)
+        if bbox.is_empty or bbox.is_infinite:
+            continue
+        if (bbox & page.rect).get_area() < min_area:
+            continue
+        # Image pixel width over its displayed width in inches
+        native_dpi = max(native_dpi, image[2] / (bbox.width / 72))
+
+    target = native_dpi * NATIVE_DPI_MARGIN if native_dpi else NO_IMAGE_DPI
+    return int(min(dpi, max(MIN_RENDER_DPI, target)))
+
+def _render_pymupdf_page(page: "pymupdf.Page", dpi: int) -> Tuple[np.ndarray, int]:
+    page_dpi = _render_dpi(page, dpi)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Rendering page %d at %d DPI", page.number + 1, page_dpi)
+    pix = page.get_pixmap(dpi=page_dpi, colorspace=pymupdf.csGRAY)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    return image, page_dpi
+
+def get_page_count(pdf_path: str) -> int:
+    """Count the pages of a PDF.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+
+    Returns:
+        int: Number of pages
+    """
+    if pymupdf is not None:
+        with pymupdf.open(pdf_path) as doc:
+            return doc.page_count
+
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path)["Pages"]
+
+def _render_page(pdf_path: str, page_number: int, dpi: int) -> Tuple[ImageSource, int]:
+    """Render a single PDF page.
+
+    PyMuPDF renders in-process straight to a grayscale array, at a DPI
+    adapted to the page content. Without it, pdf2image runs pdftocairo and
+    returns a PIL image at the given DPI.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        page_number (int): 1-based page number
+        dpi (int): Maximum DPI for PDF conversion
+
+    Returns:
+        Tuple[ImageSource, int]: Rendered page as a grayscale numpy array or
+            PIL image, and the DPI it was rendered at
+    """
+    if pymupdf is not None:
+        with pymupdf.open(pdf_path) as doc:
+            return _render_pymupdf_page(doc[page_number - 1], dpi)
+
+    # pdftocairo is faster than pdftoppm
+    from pdf2image import convert_from_path
+    image = convert_from_path(
+        pdf_path, dpi=dpi, first_page=page_number, last_page=page_number,
+        use_pdftocairo=True)[0]
+    return image, dpi
+
+def _render_pages(pdf_path: str, dpi: int) -> Iterator[Tuple[int, Callable[[], Tuple[ImageSource, int]]]]:
+    """Iterate over the pages of a PDF, rendering each one on demand.
+
+    The document is opened once. Each page is rendered when its render
+    function is called, so a page that fails to render does not stop the
+    iteration.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        dpi (int): Maximum DPI for PDF conversion
+
+    Yields:
+        Tuple[int, Callable[[], Tuple[ImageSource, int]]]: 1-based page
+            number and a function returning the rendered page and the DPI it
+            was rendered at
+    """
+    if pymupdf is None:
+        for page_number in range(1, get_page_count(pdf_path) + 1):
+            yield page_number, partial(_render_page, pdf_path, page_number, dpi)
+        return
+
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            yield page.number + 1, partial(_render_pymupdf_page, page, dpi)
+
+def _return_rendered(rendered: Optional[Tuple[ImageSource, int]], error: Optional[Exception]) -> Tuple[ImageSource, int]:
+    if error is not None:
+        raise error
+    return rendered
+
+def _render_ahead(pdf_path: str, dpi: int) -> Iterator[Tuple[int, Callable[[], Tuple[ImageSource, int]]]]:
+    """Iterate over the pages of a PDF, rendered on a background thread.
+
+    Up to RENDER_AHEAD pages are rendered while the caller runs OCR on the
+    current one, so rendering and recognition overlap instead of taking
+    turns. Render errors are raised when the page's render function is
+    called, as with _render_pages.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        dpi (int): Maximum DPI for PDF conversion
+
+    Yields:
+        Tuple[int, Callable[[], Tuple[ImageSource, int]]]: 1-based page
+            number and a function returning the rendered page and the DPI it
+            was rendered at
+    """
+    rendered_pages = queue.Queue(maxsize=RENDER_AHEAD)
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for page_number, render in _render_pages(pdf_path, dpi):
+                if stop.is_set():
+                    return
+                try:
+                    rendered_pages.put((page_number, render(), None))
+                except Exception as e:
+                    rendered_pages.put((page_number, None, e))
+            rendered_pages.put((None, None, None))
+        except Exception as e:
+            # The document itself could not be read
+            rendered_pages.put((None, None, e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            page_number, rendered, error = rendered_pages.get()
+            if page_number is None:
+                if error is not None:
+                    raise error
+                return
+            yield page_number, partial(_return_rendered, rendered, error)
+    finally:
+        # Unblock the producer if the caller stopped early
+        stop.set()
+        while producer.is_alive():
+            try:
+                rendered_pages.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+def _page_errors() -> Tuple[type, ...]:
+    """Exceptions that fail a single page without failing the whole PDF.
+
+    Covers corrupt page content reported by PyMuPDF or Poppler, unreadable
+    images, and OpenCV and Tesseract failures. Anything else is a bug and
+    fails the PDF.
+
+    Returns:
+        Tuple[type, ...]: Exception types to catch per page
+    """
+    errors = (UnidentifiedImageError, TesseractError, cv2.error)
+    if pymupdf is not None:
+        errors += (pymupdf.FileDataError, pymupdf.mupdf.FzErrorBase)
+    else:
+        from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError
+        errors += (PDFPageCountError, PDFSyntaxError)
+    return errors
+
+def _process_page(page_number: int, render: Callable[[], Tuple[ImageSource, int]], dpi: int,
+                  api: Optional["PyTessBaseAPI"] = None) -> Tuple[int, str, Optional[Boxes], float, Optional[str]]:
+    """Render and OCR a PDF page.
+
+    Args:
+        page_number (int): 1-based page number
+        render (Callable[[], Tuple[ImageSource, int]]): Function returning the
+            rendered page and the DPI it was rendered at
+        dpi (int): Requested DPI; box coordinates are mapped to it when the
+            page was rendered at another DPI
+        api (Optional[PyTessBaseAPI], optional): Tesseract engine to reuse.
+            Defaults to the worker's engine if any.
+
+    Returns:
+        Tuple[int, str, Optional[Boxes], float, Optional[str]]: Page number,
+            extracted text, text boxes, processing time in seconds and the
+            error message if the page failed, in which case there are no boxes
+    """
+    page_start_time = time.perf_counter()
+
+    try:
+        image, page_dpi = render()
+
+        # Process the image
+        result = ocr_with_boxes(image, api=api)
+    except _page_errors() as e:
+        logger.error("Error processing page %d: %s", page_number, e)
+        return page_number, "", None, time.perf_counter() - page_start_time, str(e)
+
+    if not result['text']:
+        logger.warning("No text extracted from page %d", page_number)
+
+    # Add page number to boxes, in pixels of the requested DPI
+    page_boxes = result['boxes']
+    if page_dpi != dpi:
+        page_boxes['bbox'] = np.rint(page_boxes['bbox'] * (dpi / page_dpi)).astype(np.int32)
+    page_boxes['page'] = np.full(len(page_boxes['text']), page_number, dtype=np.int32)
+
+    page_time = time.perf_counter() - page_start_time
+    logger.info("Page %d: %d characters, %d boxes in %.2f seconds",
+                page_number, len(result['text']), len(page_boxes['text']), page_time)
+
+    return page_number, result['text'], page_boxes, page_time, None
+
+def _ocr_page(task: Tuple[str, int, int]) -> Tuple[int, str, Optional[Boxes], float, Optional[str]]:
+    """Render and OCR a single PDF page in a worker process.
+
+    The page is rendered inside the worker and handed to OCR in memory, so
+    the bitmap never crosses the process boundary or touches the disk.
+
+    Args:
+        task (Tuple[str, int, int]): PDF path, 1-based page number and DPI
+            for PDF conversion
+
+    Returns:
+        Tuple[int, str, Optional[Boxes], float, Optional[str]]: Page result,
+            see _process_page
+    """
+    pdf_path, page_number, dpi = task
+    return _process_page(page_number, partial(_render_page, pdf_path, page_number, dpi), dpi)
+
+def _add_page(page: Tuple[int, str, Optional[Boxes], float, Optional[str]], all_texts: List[str],
+              page_boxes: List[Boxes], page_times: List[float],
+              page_errors: List[Dict[str, Any]]) -> None:
+    """Append the results of a page in page order.
+
+    Args:
+        page (Tuple[int, str, Optional[Boxes], float, Optional[str]]): Page
+            result, see _process_page
+        all_texts (List[str]): Page texts collected so far
+        page_boxes (List[Boxes]): Text boxes of the pages collected so far
+        page_times (List[float]): Processing times of the pages collected so far
+        page_errors (List[Dict[str, Any]]): Failed pages collected so far
+    """
+    page_number, text, boxes, page_time, error = page
+    page_times.append(page_time)
+    if error is not None:
+        page_errors.append({"page": page_number, "error": error})
+        return
+    if text:
+        all_texts.append(f"Page {page_number}:\n{text}")
+    page_boxes.append(boxes)
+
+def _merge_boxes(page_boxes: List[Boxes]) -> Boxes:
+    """Concatenate the text boxes of all pages column by column.
+
+    Args:
+        page_boxes (List[Boxes]): Text boxes of each page
+
+    Returns:
+        Boxes: Text boxes of the whole document
+    """
+    if not page_boxes:
+        return {
+            "text": [],
+            "bbox": np.empty((0, 4), dtype=np.int32),
+            "confidence": np.empty(0),
+            "page": np.empty(0, dtype=np.int32)
+        }
+    return {
+        "text": [word for boxes in page_boxes for word in boxes['text']],
+        "bbox": np.concatenate([boxes['bbox'] for boxes in page_boxes]),
+        "confidence": np.concatenate([boxes['confidence'] for boxes in page_boxes]),
+        "page": np.concatenate([boxes['page'] for boxes in page_boxes])
+    }
+
+def _boxes_to_records(boxes: Boxes) -> List[Dict[str, Any]]:
+    """Convert column-wise text boxes to one dictionary per box.
+
+    Args:
+        boxes (Boxes): Text boxes
+
+    Returns:
+        List[Dict[str, Any]]: Boxes with text, bbox, confidence and page keys
+    """
+    return [
+        {"text": text, "bbox": bbox, "confidence": confidence, "page": page}
+        for text, bbox, confidence, page in zip(
+            boxes['text'], boxes['bbox'].tolist(),
+            boxes['confidence'].tolist(), boxes['page'].tolist())
+    ]
+
+def process_pdf(pdf_path: str, dpi: int = 300, max_workers: Optional[int] = None) -> Dict[str, Any]:
     """Process a PDF file by converting it to images and performing OCR.
 
+    Pages are rendered and recognized in parallel worker processes. A page
+    that fails is recorded in "page_errors" and the other pages are still
+    processed; only a PDF whose pages all fail raises.
+
     Args:
         pdf_path (str): Path to the PDF file
-        dpi (int, optional): DPI for PDF conversion. Defaults to 300.
+        dpi (int, optional): Maximum DPI for PDF conversion; with PyMuPDF,
+            low-resolution scans and image-free pages render lower. Defaults to 300.
+        max_workers (Optional[int], optional): Worker processes for pages.
+            Defaults to one per core.
 
     Returns:
         Dict[str, Any]: Combined OCR results from all pages
     """
-    start_time = time.time()
-    logger.info(f"Starting PDF processing: {pdf_path} with DPI={dpi}")
+    start_time = time.perf_counter()
     
     try:
-        # Convert PDF to images
-        logger.info("Converting PDF to images...")
-        images = convert_from_path(pdf_path, dpi=dpi)
-        logger.info(f"Successfully converted PDF to {len(images)} images")
+        page_count = get_page_count(pdf_path)
         
-        # Create temporary directory for saving images
-        with tempfile.TemporaryDirectory() as temp_dir:
-            logger.debug(f"Created temporary directory: {temp_dir}")
-            all_texts = []
-            all_boxes = []
-            
-            # Process each page
-            for i, image in enumerate(images):
-                page_start_time = time.time()
-                logger.info(f"Processing page {i+1}/{len(images)}")
-                
-                # Save image temporarily
-                temp_image_path = os.path.join(temp_dir, f'page_{i+1}.png')
-                image.save(temp_image_path, 'PNG')
-                logger.debug(f"Saved temporary image: {temp_image_path}")
-                
-                try:
-                    # Process the image
-                    result = process_image(temp_image_path)
-                    
-                    # Append results
-                    if result['text']:
-                        all_texts.append(f"Page {i+1}:\n{result['text']}")
-                        logger.debug(f"Extracted {len(result['text'])} characters from page {i+1}")
-                    else:
-                        logger.warning(f"No text extracted from page {i+1}")
-                    
-                    # Add page number to boxes
-                    page_boxes = result['boxes']
-                    for box in page_boxes:
-                        box['page'] = i + 1
-                    all_boxes.extend(page_boxes)
-                    logger.debug(f"Found {len(page_boxes)} text boxes in page {i+1}")
-                    
-                    page_time = time.time() - page_start_time
-                    logger.info(f"Completed page {i+1} processing in {page_time:.2f} seconds")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing page {i+1}: {str(e)}")
-                    raise
+        all_texts = []
+        page_boxes = []
+        page_times = []
+        page_errors = []
         
-        total_time = time.time() - start_time
-        logger.info(f"PDF processing completed in {total_time:.2f} seconds")
+        workers = max(1, min(max_workers or os.cpu_count() or 1, page_count))
+        max_in_flight = 2 * workers
         
-        return {
+        if workers == 1:
+            # A single worker gains nothing from a pool; OCR in place while,
+            # for multi-page PDFs, a thread renders the next pages. Inside a
+            # folder worker its engine is reused, otherwise the Tesseract
+            # model is loaded once for all pages of this PDF
+            own_api = create_tess_api() if get_worker_api() is None else None
+            pages = _render_ahead(pdf_path, dpi) if page_count > 1 else _render_pages(pdf_path, dpi)
+            try:
+                for page_number, render in pages:
+                    _add_page(_process_page(page_number, render, dpi, own_api),
+                              all_texts, page_boxes, page_times, page_errors)
+            finally:
+                if own_api is not None:
+                    own_api.End()
+        else:
+            # Process pages in parallel, keeping at most max_in_flight pages
+            # submitted so finished pages never pile up unconsumed
+            with worker_log_queue() as log_queue, ProcessPoolExecutor(
+                    max_workers=workers, initializer=init_worker,
+                    initargs=(log_queue, logging.getLogger().getEffectiveLevel())) as executor:
+                pending = deque()
+                for page_number in range(1, page_count + 1):
+                    pending.append(executor.submit(_ocr_page, (pdf_path, page_number, dpi)))
+                    if len(pending) >= max_in_flight:
+                        _add_page(pending.popleft().result(), all_texts, page_boxes,
+                                  page_times, page_errors)
+                while pending:
+                    _add_page(pending.popleft().result(), all_texts, page_boxes,
+                              page_times, page_errors)
+        
+        total_time = time.perf_counter() - start_time
+        logger.info("Processed %s: %d pages at up to %d DPI in %.2f seconds "
+                    "(%.2f seconds/page, slowest %.2f seconds)",
+                    pdf_path, page_count, dpi, total_time,
+                    sum(page_times) / max(page_count, 1), max(page_times, default=0.0))
+        
+        if page_errors and len(page_errors) == page_count:
+            raise RuntimeError(f"All {page_count} pages failed: " + "; ".join(
+                f"page {page_error['page']}: {page_error['error']}" for page_error in page_errors))
+        
+        result = {
             "text": "\n\n".join(all_texts),
-            "boxes": all_boxes
+            "boxes": _boxes_to_records(_merge_boxes(page_boxes))
         }
+        if page_errors:
+            result["page_errors"] = page_errors
+        return result
         
     except Exception as e:
-        logger.error(f"Failed to process PDF: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error("Failed to process PDF %s: %s", pdf_path, e)
+        raise
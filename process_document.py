@@ -1,30 +1,346 @@
 import os
-import json
-from typing import Dict, List, Any
-from image_processor import process_image
-from pdf_processor import process_pdf
+import orjson
+from typing import Dict, List, Any, Tuple, Optional, Iterator
+from image_processor import process_image, ocr_batch, build_result, extract_structured_data, needs_extraction, warm_up_llm, init_worker, worker_log_queue, BATCH_TEMP_ROOT, PREPROC_VERSION, TESSERACT_CONFIG, MODEL_NAME, SCHEMA_VERSION
+import ocr_cache
+from pdf_processor import process_pdf, get_page_count, HAS_PYMUPDF
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from functools import partial
+import threading
+import tempfile
+import logging
+import time
 
-def process_document(file_path: str, dpi: int = 300) -> Dict[str, Any]:
+# Leading bytes identifying each supported image type
+FILE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8', 'jpeg'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'BM', 'bmp'),
+]
+
+# File types handled by the image pipeline
+IMAGE_TYPES = {'png', 'jpeg', 'tiff', 'bmp'}
+
+# Like Poppler and MuPDF, accept a PDF header anywhere in the first bytes,
+# after BOMs, mail or HTTP wrappers and other leading junk
+PDF_SIGNATURE = b'%PDF-'
+PDF_HEADER_WINDOW = 1024
+
+# File types of files without a recognized signature, by extension
+EXTENSION_TYPES = {
+    '.pdf': 'pdf',
+    '.png': 'png',
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.tiff': 'tiff',
+    '.bmp': 'bmp',
+}
+
+# Folder-level worker processes, one per core. Each one OCRs a single
+# image batch or PDF at a time with its own single-threaded Tesseract
+# engine; PDFs are processed page by page inside the worker, with no
+# nested page pool to spawn or oversubscribe the cores
+MAX_WORKERS = os.cpu_count() or 1
+
+# Threads writing JSON results while the LLM is busy
+IO_WORKERS = 4
+
+# Images per Tesseract batch, and jobs (image batches or documents) queued
+# on the folder pool ahead of the workers, which keeps memory flat on huge
+# folders
+IMAGE_BATCH_SIZE = 32
+MAX_PENDING_JOBS = 2 * MAX_WORKERS
+
+def _result_cache_key(file_path: str, dpi: int) -> str:
+    return ocr_cache.make_key(ocr_cache.file_digest(file_path), f"@{dpi}",
+                              PREPROC_VERSION, TESSERACT_CONFIG, MODEL_NAME, SCHEMA_VERSION)
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Load a cached document result.
+
+    Args:
+        key (str): Result cache key
+
+    Returns:
+        Optional[Dict[str, Any]]: Cached OCR results, or None on a miss
+    """
+    result = ocr_cache.get_json('documents', key)
+    if result is not None and not isinstance(result, dict):
+        ocr_cache.evict('documents', key)
+        return None
+    return result
+
+def _cache_put(key: str, result: Dict[str, Any]) -> None:
+    """Store a document result in the cache.
+
+    Args:
+        key (str): Result cache key
+        result (Dict[str, Any]): OCR results
+    """
+    ocr_cache.put_json('documents', key, result)
+
+def _sniff(file_path: str) -> Optional[str]:
+    """Detect a file's type from its leading bytes.
+
+    Unlike the extension, the content cannot be misnamed, so a JPEG saved
+    as .pdf never reaches the PDF renderer. Files without a recognized
+    signature fall back to their extension.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        Optional[str]: 'pdf', 'png', 'jpeg', 'tiff' or 'bmp', or None for
+            unsupported files
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(PDF_HEADER_WINDOW)
+    for signature, kind in FILE_SIGNATURES:
+        if header.startswith(signature):
+            return kind
+    if PDF_SIGNATURE in header:
+        return 'pdf'
+    return EXTENSION_TYPES.get(os.path.splitext(file_path)[1].lower())
+
+def process_document(file_path: str, dpi: int = 300, page_workers: Optional[int] = None) -> Dict[str, Any]:
     """Process a single document (PDF or image) and return the OCR results.
 
+    Results are cached by file content and DPI, so unchanged files are not
+    processed again. The cache is kept in size by ocr_cache.prune.
+
     Args:
         file_path (str): Path to the input file
         dpi (int, optional): DPI for PDF conversion. Defaults to 300.
+        page_workers (Optional[int], optional): Worker processes for PDF pages.
+            Defaults to one per core.
 
     Returns:
         Dict[str, Any]: OCR results containing text and bounding boxes
     """
-    # Get file extension
-    _, ext = os.path.splitext(file_path)
-    ext = ext.lower()
+    kind = _sniff(file_path)
+    if kind is None:
+        raise ValueError(f"Unsupported file type: {os.path.splitext(file_path)[1].lower()}")
+
+    start_time = time.time()
+    key = _result_cache_key(file_path, dpi)
+    result = _cache_get(key)
+    if result is not None:
+        # Report the time of this run, not the one that filled the cache
+        if "processing_info" in result:
+            result["processing_info"]["processing_time"] = time.time() - start_time
+            result["processing_info"]["cached"] = True
+        return result
 
     # Process based on file type
-    if ext == '.pdf':
-        return process_pdf(file_path, dpi)
-    elif ext in ['.png', '.jpg', '.jpeg', '.tiff', '.bmp']:
-        return process_image(file_path)
+    if kind == 'pdf':
+        result = process_pdf(file_path, dpi, max_workers=page_workers)
+    else:
+        result = process_image(file_path)
+
+    # Failed LLM calls and pages are retried on the next run instead of being cached
+    if not result.get("error", "").startswith("LLM processing failed") and "page_errors" not in result:
+        _cache_put(key, result)
+    return result
+
+def _save_result(result: Dict[str, Any], output_dir: str, filename: str) -> None:
+    """Save OCR results for a file as JSON in the output directory.
+
+    Args:
+        result (Dict[str, Any]): OCR results
+        output_dir (str): Output directory path
+        filename (str): Name of the processed input file
+    """
+    output_file = os.path.join(
+        output_dir,
+        f"{os.path.splitext(filename)[0]}.json"
+    )
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+def _save_and_report(result: Dict[str, Any], output_dir: str, filename: str) -> None:
+    """Save OCR results for a file and report the outcome.
+
+    Args:
+        result (Dict[str, Any]): OCR results
+        output_dir (str): Output directory path
+        filename (str): Name of the processed input file
+    """
+    try:
+        _save_result(result, output_dir, filename)
+        print(f"Successfully processed: {filename}")
+    except Exception as e:
+        print(f"Error processing {filename}: {str(e)}")
+
+def _process_images(input_dir: str, filenames: List[str], temp_dir: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """OCR images of a folder in a single Tesseract run.
+
+    Structured data extraction is left out so it can be batched across the
+    whole folder.
+
+    Args:
+        input_dir (str): Input directory path
+        filenames (List[str]): Image file names inside the input directory
+        temp_dir (Optional[str], optional): Directory for temporary OCR files
+            shared by the whole folder run. Defaults to None.
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: File names with their OCR results
+    """
+    start_time = time.time()
+    paths = [os.path.join(input_dir, filename) for filename in filenames]
+    try:
+        texts = ocr_batch(paths, temp_dir)
+    except Exception as e:
+        for filename in filenames:
+            print(f"Error processing {filename}: {str(e)}")
+        return []
+
+    # Tesseract recognizes the batch in one run, so each image is charged an
+    # equal share of it; the whole run is reported as batch_time
+    batch_time = time.time() - start_time
+    image_ocr_time = batch_time / max(len(texts), 1)
+
+    results = []
+    for filename, file_path in zip(filenames, paths):
+        try:
+            if file_path not in texts:
+                raise ValueError(f"Could not read image: {file_path}")
+            result = build_result(texts[file_path], time.time() - image_ocr_time, extract=False)
+            result["processing_info"]["batch_time"] = batch_time
+            results.append((filename, result))
+        except Exception as e:
+            print(f"Error processing {filename}: {str(e)}")
+    return results
+
+def _process_and_save(file_path: str, output_dir: str, dpi: int) -> None:
+    """Process a single document of a folder in a worker and save the results.
+
+    Args:
+        file_path (str): Path to the input file
+        output_dir (str): Output directory path
+        dpi (int): DPI for PDF conversion
+    """
+    filename = os.path.basename(file_path)
+    try:
+        # Process the document
+        result = process_document(file_path, dpi, page_workers=1)
+
+        # Save results to JSON file
+        _save_result(result, output_dir, filename)
+        print(f"Successfully processed: {filename}")
+    except Exception as e:
+        print(f"Error processing {filename}: {str(e)}")
+
+def _list_files(input_dir: str) -> Iterator[Tuple[os.DirEntry, Optional[str]]]:
+    """List the files of a folder with their detected type.
+
+    Entries are yielded while the directory is being read, with the file
+    type information os.scandir already has, so no per-file stat is needed.
+
+    Args:
+        input_dir (str): Input directory path
+
+    Yields:
+        Tuple[os.DirEntry, Optional[str]]: Directory entry and file type,
+            None for unsupported or unreadable files
+    """
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            try:
+                kind = _sniff(entry.path)
+            except OSError:
+                # Reported when the file is processed as a document
+                kind = None
+            yield entry, kind
+
+def _file_size(file_path: str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        # Reported when the file is processed
+        return 0
+
+def _document_cost(file_path: str, kind: Optional[str]) -> int:
+    """Estimate the relative processing time of a document.
+
+    Args:
+        file_path (str): Path to the document
+        kind (Optional[str]): File type detected by _sniff
+
+    Returns:
+        int: File size, multiplied by the page count for PDFs when PyMuPDF
+            is available to count them cheaply
+    """
+    size = _file_size(file_path)
+    if kind != 'pdf' or not HAS_PYMUPDF:
+        return size
+    try:
+        return size * get_page_count(file_path)
+    except Exception:
+        # Unreadable PDFs fail fast in their worker
+        return size
+
+def _forward_result(target: Future, future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        target.set_exception(error)
     else:
-        raise ValueError(f"Unsupported file type: {ext}")
+        target.set_result(future.result())
+
+def _submit_jobs(executor: ProcessPoolExecutor, input_dir: str, image_batches: List[Tuple[List[str], Future]],
+                 documents: List[Tuple[str, Optional[str]]], temp_dir: str, output_dir: str, dpi: int) -> None:
+    """Process the image batches and documents of a folder, longest first.
+
+    Longest first means no large PDF is left running alone at the end while
+    the other workers idle. Image batches cost their total file size. At
+    most MAX_PENDING_JOBS are queued on the pool at a time.
+
+    Args:
+        executor (ProcessPoolExecutor): Folder worker pool
+        input_dir (str): Input directory path
+        image_batches (List[Tuple[List[str], Future]]): Image file names of
+            each batch, with the future to pass the batch results to
+        documents (List[Tuple[str, Optional[str]]]): Paths to the documents
+            with the file types detected by _sniff
+        temp_dir (str): Directory for temporary OCR files
+        output_dir (str): Output directory path
+        dpi (int): DPI for PDF conversion
+    """
+    jobs = [
+        (sum(_file_size(os.path.join(input_dir, filename)) for filename in filenames),
+         _process_images, (input_dir, filenames, temp_dir), result)
+        for filenames, result in image_batches
+    ]
+    jobs += [
+        (_document_cost(file_path, kind), _process_and_save, (file_path, output_dir, dpi), None)
+        for file_path, kind in documents
+    ]
+    jobs.sort(key=lambda job: job[0], reverse=True)
+
+    pending = set()
+    for submitted, (_, fn, args, result) in enumerate(jobs):
+        try:
+            if len(pending) >= MAX_PENDING_JOBS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            future = executor.submit(fn, *args)
+        except BaseException as e:
+            # Do not leave the caller waiting on batches that never ran
+            for _, _, _, unsubmitted in jobs[submitted:]:
+                if unsubmitted is not None:
+                    unsubmitted.set_exception(e)
+            raise
+        if result is not None:
+            future.add_done_callback(partial(_forward_result, result))
+        pending.add(future)
+
+    for future in as_completed(pending):
+        future.result()
 
 def process_folder(input_dir: str, output_dir: str, dpi: int = 300) -> None:
     """Process all supported documents in a folder.
@@ -37,21 +353,58 @@ def process_folder(input_dir: str, output_dir: str, dpi: int = 300) -> None:
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
-    # Process each file in the directory
-    for filename in os.listdir(input_dir):
-        file_path = os.path.join(input_dir, filename)
-        if os.path.isfile(file_path):
-            try:
-                # Process the document
-                result = process_document(file_path, dpi)
-                
-                # Save results to JSON file
-                output_file = os.path.join(
-                    output_dir,
-                    f"{os.path.splitext(filename)[0]}.json"
-                )
-                with open(output_file, 'w') as f:
-                    json.dump(result, f, indent=4)
-                print(f"Successfully processed: {filename}")
-            except Exception as e:
-                print(f"Error processing {filename}: {str(e)}")
\ No newline at end of file
+    # Prime the LLM prompt cache while the images are being OCR'd
+    warm_up = threading.Thread(target=warm_up_llm)
+
+    # One temporary directory serves every image batch of the run
+    with tempfile.TemporaryDirectory(dir=BATCH_TEMP_ROOT) as temp_dir, \
+            worker_log_queue() as log_queue, ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, initializer=init_worker,
+                initargs=(log_queue, logging.getLogger().getEffectiveLevel())) as executor:
+        image_batches = []
+        documents = []
+        batch = []
+
+        # Group the images into batches and collect the other documents
+        for entry, kind in _list_files(input_dir):
+            if kind in IMAGE_TYPES:
+                if not batch and not image_batches:
+                    warm_up.start()
+                batch.append(entry.name)
+                if len(batch) == IMAGE_BATCH_SIZE:
+                    image_batches.append((batch, Future()))
+                    batch = []
+            else:
+                documents.append((entry.path, kind))
+
+        if batch:
+            image_batches.append((batch, Future()))
+
+        # Jobs are costed and fed from a thread so the images can go on to
+        # LLM extraction as soon as their batches are done
+        feeder = ThreadPoolExecutor(max_workers=1)
+        jobs_done = feeder.submit(
+            _submit_jobs, executor, input_dir, image_batches, documents, temp_dir, output_dir, dpi)
+        feeder.shutdown(wait=False)
+
+        image_results = []
+        for future in as_completed([result for _, result in image_batches]):
+            image_results.extend(future.result())
+
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as io_pool:
+            # Write results that need no extraction while the LLM runs
+            to_extract = []
+            for filename, result in image_results:
+                if needs_extraction(result):
+                    to_extract.append((filename, result))
+                else:
+                    io_pool.submit(_save_and_report, result, output_dir, filename)
+
+            # Extract structured data for all images with batched LLM calls
+            if warm_up.is_alive():
+                warm_up.join()
+            extract_structured_data([result for _, result in to_extract])
+            for filename, result in to_extract:
+                io_pool.submit(_save_and_report, result, output_dir, filename)
+
+        jobs_done.result()
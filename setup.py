@@ -1,17 +1,42 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 setup(
     name="langchain_ocr",
     version="0.1.0",
-    packages=find_packages(),
+    py_modules=[
+        "ocr_doc",
+        "process_document",
+        "image_processor",
+        "pdf_processor",
+        "text_processor",
+        "ocr_cache",
+        "llm_json"
+    ],
     install_requires=[
-        "langchain",
-        "langgraph",
-        "langchain-openai",
-        "pillow",
-        "pytesseract"
+        "pillow>=10",
+        "pytesseract>=0.3.10",
+        "opencv-python-headless>=4.5",
+        "numpy>=1.19",
+        "openai>=1.0",
+        "requests",
+        "orjson>=3.9",
+        "PyMuPDF>=1.24.3",
+        "pyahocorasick>=2.0"
     ],
-    python_requires=">=3.8",
+    extras_require={
+        "pdf": ["pdf2image>=1.16"],
+        "llm": [
+            "langchain",
+            "langgraph",
+            "langchain-openai",
+            "langchain-community",
+            "httpx>=0.25"
+        ]
+    },
+    entry_points={
+        "console_scripts": ["ocr-doc=ocr_doc:main"]
+    },
+    python_requires=">=3.10",
     description="OCR processing pipeline using LangChain",
     author="Your Name",
     author_email="your.email@example.com"
@@ -1,6 +1,48 @@
 import re
 from typing import Dict, List, Tuple
 
+try:
+    import ahocorasick
+except ImportError:  # Fall back to plain substring checks
+    ahocorasick = None
+
+# Patterns are compiled once at import and every family of single-token
+# substitutions is merged into one alternation, so each fix is one pass
+# over the text with a dictionary lookup for the replacement
+
+# Isolated letters that OCR reads instead of digits
+_DIGIT_FIXES = {'I': '1', 'O': '0', 'B': '8'}
+_DIGIT_FIX_PATTERN = re.compile(r'\b[IOB]\b')
+
+# Price formats
+_DECIMAL_SPACING_PATTERN = re.compile(r'(\d+)\s*\.\s*(\d{2})')
+_MISSING_DECIMAL_PATTERN = re.compile(r'(\d+)\s+(\d{2})(?=\s|$)')
+
+# Receipt formatting
+_SEPARATOR_PATTERN = re.compile(r'[-_=]{3,}')
+_QUANTITY_PATTERN = re.compile(r'(\d+)\s*[xX]\s*')
+_TOTAL_PATTERN = re.compile(r'(?i)(sub)?total\s*:')
+_LINE_BREAKS_PATTERN = re.compile(r'\n{3,}')
+
+# OCR artifacts
+_PUNCTUATION_SPACING_PATTERN = re.compile(r'\s*([.,!?:;])\s*')
+_BROKEN_WORD_PATTERN = re.compile(r'([A-Z])\s+([a-z]{1,2})\b')
+_ISOLATED_DIGIT_FIXES = {
+    '0': 'O',  # Zero to O confusion
+    '1': 'I',  # One to I confusion
+    '5': 'S',  # Five to S confusion
+    '8': 'B',  # Eight to B confusion
+}
+_ISOLATED_DIGIT_PATTERN = re.compile(r'(?<!\d)[0158](?!\d)')
+_CHARACTER_FIXES = {
+    'rn': 'm',  # 'rn' to 'm' confusion
+    'cl': 'd',  # 'cl' to 'd' confusion
+    'vv': 'w',  # 'vv' to 'w' confusion
+}
+_CHARACTER_FIX_PATTERN = re.compile(r'rn|cl|vv')
+_CURRENCY_FIXES = {'$5': '$S', '$0': '$O'}
+_CURRENCY_FIX_PATTERN = re.compile(r'\$[50]')
+
 
 class TextProcessor:
     def __init__(self):
@@ -20,6 +62,57 @@ class TextProcessor:
             'date_pattern': r'due\s+date|payment\s+due',  # Due date related patterns
         }
 
+        # Keyword automatons find every keyword in one pass over the text
+        self._receipt_automaton = self._build_automaton(
+            self.receipt_patterns['keywords'])
+        self._invoice_automaton = self._build_automaton(
+            self.invoice_patterns['keywords'])
+
+        # Compiled forms of the scoring patterns
+        self._price_regex = re.compile(self.receipt_patterns['price_pattern'])
+        self._receipt_date_regex = re.compile(
+            self.receipt_patterns['date_pattern'])
+        self._invoice_num_regex = re.compile(
+            self.invoice_patterns['invoice_num_pattern'], re.IGNORECASE)
+        self._invoice_date_regex = re.compile(
+            self.invoice_patterns['date_pattern'], re.IGNORECASE)
+
+    @staticmethod
+    def _build_automaton(keywords: List[str]):
+        """Build an Aho-Corasick automaton matching the given keywords.
+
+        Args:
+            keywords (List[str]): Keywords to match
+
+        Returns:
+            ahocorasick.Automaton: Automaton yielding matched keywords, or None
+                if pyahocorasick is not installed
+        """
+        if ahocorasick is None:
+            return None
+
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+
+    @staticmethod
+    def _count_keywords(automaton, keywords: List[str], text: str) -> int:
+        """Count how many distinct keywords occur in the text.
+
+        Args:
+            automaton (ahocorasick.Automaton): Automaton built from the keywords
+            keywords (List[str]): Keywords, used when no automaton is available
+            text (str): Preprocessed text
+
+        Returns:
+            int: Number of keywords found
+        """
+        if automaton is None:
+            return sum(keyword in text for keyword in keywords)
+        return len({keyword for _, keyword in automaton.iter(text)})
+
     def clean_text(self, text: str) -> str:
         """Clean OCR output with essential receipt text processing.
 
@@ -32,16 +125,15 @@ class TextProcessor:
         # Preserve line breaks and strip whitespace
         text = '\n'.join(line.strip() for line in text.split('\n'))
 
-        # Fix common OCR errors in numbers
-        text = re.sub(r'\bI\b', '1', text)  # Fix I -> 1
-        text = re.sub(r'\bO\b', '0', text)  # Fix O -> 0
-        text = re.sub(r'\bB\b', '8', text)  # Fix B -> 8
+        # Fix common OCR errors in numbers (I -> 1, O -> 0, B -> 8)
+        text = _DIGIT_FIX_PATTERN.sub(
+            lambda m: _DIGIT_FIXES[m.group()], text)
 
         # Fix price formats
         # Fix decimal spacing
-        text = re.sub(r'(\d+)\s*\.\s*(\d{2})', r'\1.\2', text)
+        text = _DECIMAL_SPACING_PATTERN.sub(r'\1.\2', text)
         # Fix missing decimal point
-        text = re.sub(r'(\d+)\s+(\d{2})(?=\s|$)', r'\1.\2', text)
+        text = _MISSING_DECIMAL_PATTERN.sub(r'\1.\2', text)
 
         return text.strip()
 
@@ -55,16 +147,16 @@ class TextProcessor:
             str: Text with improved formatting
         """
         # Fix common item separator patterns
-        text = re.sub(r'[-_=]{3,}', '\n', text)
+        text = _SEPARATOR_PATTERN.sub('\n', text)
 
         # Fix common quantity patterns (e.g., "2 x" -> "2x")
-        text = re.sub(r'(\d+)\s*[xX]\s*', r'\1x ', text)
+        text = _QUANTITY_PATTERN.sub(r'\1x ', text)
 
         # Fix common total line patterns
-        text = re.sub(r'(?i)(sub)?total\s*:', r'\1TOTAL:', text)
+        text = _TOTAL_PATTERN.sub(r'\1TOTAL:', text)
 
         # Normalize multiple line breaks
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = _LINE_BREAKS_PATTERN.sub('\n\n', text)
 
         return text
 
@@ -77,36 +169,23 @@ class TextProcessor:
         Returns:
             str: Text with common errors fixed
         """
-        # Common OCR substitutions with context awareness
-        substitutions = [
-            (r'0', 'O'),  # Zero to O confusion
-            (r'1', 'I'),  # One to I confusion
-            (r'5', 'S'),  # Five to S confusion
-            (r'8', 'B'),  # Eight to B confusion
-            (r'rn', 'm'),  # 'rn' to 'm' confusion
-            (r'cl', 'd'),  # 'cl' to 'd' confusion
-            (r'vv', 'w'),  # 'vv' to 'w' confusion
-        ]
-
         # Fix common spacing issues around punctuation
-        text = re.sub(r'\s*([.,!?:;])\s*', r'\1 ', text)
+        text = _PUNCTUATION_SPACING_PATTERN.sub(r'\1 ', text)
 
         # Fix broken words (e.g., 'T otal' -> 'Total')
-        text = re.sub(r'([A-Z])\s+([a-z]{1,2})\b', r'\1\2', text)
-
-        # Apply substitutions with context awareness
-        for pattern, replacement in substitutions:
-            # Only substitute when the pattern appears in a likely error context
-            if pattern.isdigit():
-                # For digit substitutions, only apply when isolated
-                text = re.sub(f'(?<!\d){pattern}(?!\d)', replacement, text)
-            else:
-                # For character pattern substitutions
-                text = re.sub(pattern, replacement, text)
-
-        # Fix common currency symbol misrecognitions
-        text = re.sub(r'\$5', '$S', text)  # Fix $5 -> $S confusion
-        text = re.sub(r'\$0', '$O', text)  # Fix $0 -> $O confusion
+        text = _BROKEN_WORD_PATTERN.sub(r'\1\2', text)
+
+        # Digit substitutions only apply to isolated digits
+        text = _ISOLATED_DIGIT_PATTERN.sub(
+            lambda m: _ISOLATED_DIGIT_FIXES[m.group()], text)
+
+        # Character pattern substitutions
+        text = _CHARACTER_FIX_PATTERN.sub(
+            lambda m: _CHARACTER_FIXES[m.group()], text)
+
+        # Fix common currency symbol misrecognitions ($5 -> $S, $0 -> $O)
+        text = _CURRENCY_FIX_PATTERN.sub(
+            lambda m: _CURRENCY_FIXES[m.group()], text)
 
         return text
 
@@ -155,17 +234,16 @@ class TextProcessor:
         score = 0.0
 
         # Check for receipt keywords
-        keyword_matches = sum(
-            keyword in text for keyword in self.receipt_patterns['keywords'])
+        keyword_matches = self._count_keywords(
+            self._receipt_automaton, self.receipt_patterns['keywords'], text)
         score += keyword_matches * 0.5
 
         # Check for price patterns
-        price_matches = len(re.findall(
-            self.receipt_patterns['price_pattern'], text))
+        price_matches = len(self._price_regex.findall(text))
         score += min(price_matches / 3, 2.0)  # Cap the price pattern score
 
         # Check for date patterns
-        if re.search(self.receipt_patterns['date_pattern'], text):
+        if self._receipt_date_regex.search(text):
             score += 1.0
 
         return score
@@ -182,16 +260,16 @@ class TextProcessor:
         score = 0.0
 
         # Check for invoice keywords
-        keyword_matches = sum(
-            keyword in text for keyword in self.invoice_patterns['keywords'])
+        keyword_matches = self._count_keywords(
+            self._invoice_automaton, self.invoice_patterns['keywords'], text)
         score += keyword_matches * 0.5
 
         # Check for invoice number pattern
-        if re.search(self.invoice_patterns['invoice_num_pattern'], text, re.IGNORECASE):
+        if self._invoice_num_regex.search(text):
             score += 2.0
 
         # Check for due date pattern
-        if re.search(self.invoice_patterns['date_pattern'], text, re.IGNORECASE):
+        if self._invoice_date_regex.search(text):
             score += 1.0
 
         return score